@@ -1,30 +1,135 @@
 import re
+import argparse
+import asyncio
+import sys
+import json
+import hashlib
 import time
+import random
 import csv
+import gzip
+import io
 import threading
+import queue
 import uuid
+import sqlite3
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.remote.client_config import ClientConfig
 import os
 import requests
+import aiohttp
+import lxml.html
+from lxml import etree
 from datetime import date, timedelta, datetime
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from urllib.parse import urljoin
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, InvalidSessionIdException
 
-# Global lock for CSV writing
-csv_lock = threading.Lock()
+# Log records are queued by the scraping threads and written by a single listener thread
+logger = logging.getLogger(__name__)
+_log_listener = None
+PROGRESS_LOG_EVERY = 10  # single-threaded run logs "Processing i/n" once per this many URLs
 
 # === TESTING LIMITS ===
 # Set these to None or 0 to disable the limits
 TEST_MAX_PROPERTIES = 200  # scrape only first 200 properties
 
-
-def init_driver():
+# === ADAPTIVE BATCHING ===
+# Pass batch_size="auto" to let the CSV flush size follow the measured flush cost
+AUTO_BATCH_MIN = 5
+AUTO_BATCH_MAX = 1024
+FAST_FLUSH_MS = 5.0  # flushes faster than this (EMA) double the batch size
+FLUSH_EMA_WINDOW = 5  # number of flushes the EMA roughly averages over
+SOFT_MAX_BYTES = 16 * 1024 * 1024  # halve the batch size past this much pending data
+WRITER_IDLE_FLUSH_S = 2.0  # the CSV writer thread flushes a partial batch after this long without new rows
+WRITER_MAX_DELAY_S = 10.0  # ...and never keeps a row pending longer than this
+WRITER_QUEUE_MAX = 1000  # rows waiting for the writer thread before submit() blocks
+WRITER_BUFFER_KEEP = 128 * 1024  # a row buffer that grew past this is replaced after the flush
+# SCRAPER_GZIP_OUTPUT=1 writes results as .csv.gz: each batch is its own gzip member, so a partial file still reads
+GZIP_OUTPUT = os.environ.get('SCRAPER_GZIP_OUTPUT', '0') != '0'
+GZIP_LEVEL = 3
+OUTPUT_EXTENSION = '.csv.gz' if GZIP_OUTPUT else '.csv'
+
+# === BROWSER MEMORY ===
+# Long runs reuse one Chrome per worker; keep its renderer heap and caches bounded
+PURGE_EVERY_N_PAGES = 50  # force JS GC + clear HTTP cache every N properties
+RECYCLE_TAB_EVERY_N_PAGES = 200  # replace the active tab every N properties
+MAX_DRIVER_ATTEMPTS = 2  # tries per URL before giving up when the browser session dies
+
+# === WORKERS ===
+# Workers mostly wait on Chrome, so the pool is sized by browser memory rather than CPU cores.
+# SCRAPER_WORKERS overrides the computed default.
+DRIVER_MEMORY_MB = 300  # rough footprint of one Chrome session
+MAX_WORKERS = 32
+ERROR_BACKOFF_S = (0.2, 0.8)  # jittered pause after a failed property; successful ones move straight on
+
+# === BANDWIDTH ===
+# Images, fonts, media and trackers are never parsed, so Chrome doesn't fetch them
+BLOCKED_URL_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.mp4", "*.webm",
+    "*googletagmanager*", "*google-analytics*", "*doubleclick*", "*facebook.net*", "*hotjar*",
+    "*googlesyndication*", "*adservice*", "*criteo*", "*bat.bing.com*",
+]
+
+# === HTTP FETCHING ===
+# Search results and property pages are first fetched without a browser; whatever lacks data goes to Selenium
+HTTP_FIRST = os.environ.get('SCRAPER_HTTP_FIRST', '1') != '0'
+HTTP_MAX_CONNECTIONS = 100
+HTTP_CONCURRENCY = 50  # property pages in flight at once
+HTTP_TIMEOUT = 20  # seconds per property page
+HTTP_PROBE_PAGES = 5  # tried first; if none of them parse, the whole run goes through the browser
+SEARCH_PAGE_SIZE = 25  # result cards per searchresults.html page, the step of its offset= parameter
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"
+)
+HTTP_HEADERS = {
+    "User-Agent": BROWSER_USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+# === URL CACHE ===
+# Property URLs found for a set of destinations are reused for URL_CACHE_TTL seconds (0 disables)
+URL_CACHE_DIR = os.environ.get('URL_CACHE_DIR', '/app/results/.cache')
+URL_CACHE_TTL = 24 * 3600
+
+# === GEOCODING ===
+# Nominatim allows one request per second; answers are cached on disk by rounded coordinates
+NOMINATIM_MIN_INTERVAL = 1.1  # seconds between two Nominatim requests
+GEOCODE_PRECISION = 4  # decimals kept for lat/lon (~11m), so neighbouring properties share a cache entry
+GEOCODE_CACHE_PATH = os.path.join(URL_CACHE_DIR, 'nominatim.sqlite')
+GEOCODE_CACHE_TTL = 30 * 24 * 3600
+
+
+def setup_logging(level=logging.INFO):
+    """Route log records through a queue so worker threads never block on stdout"""
+    global _log_listener
+    if _log_listener is not None:
+        return _log_listener
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s', '%H:%M:%S'))
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+    _log_listener = QueueListener(log_queue, handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    return _log_listener
+
+
+def init_driver(pool_maxsize=1):
     """Initialize and return a remote Chrome WebDriver."""
     chrome_options = Options()
     chrome_options.add_argument('--no-sandbox')
@@ -33,20 +138,35 @@ def init_driver():
     chrome_options.add_argument('--disable-gpu')
     chrome_options.add_argument('--window-size=1920,1080')
     chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disk-cache-size=50000000')  # cap on-disk cache at ~50MB
+    chrome_options.add_argument('--media-cache-size=50000000')
     chrome_options.add_argument('--disable-blink-features=AutomationControlled')
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option('useAutomationExtension', False)
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36")
+    chrome_options.add_argument(f"user-agent={BROWSER_USER_AGENT}")
     chrome_options.add_argument('--ignore-ssl-errors=yes')
     chrome_options.add_argument('--ignore-certificate-errors')
+    chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    })
+    # driver.get returns at DOMContentLoaded; every page step below waits for the elements it needs
+    chrome_options.page_load_strategy = 'eager'
     # Connect to the Selenium Hub/Node using the service name from docker-compose.yml
     # selenium_url = os.environ.get('SELENIUM_URL', 'http://localhost:4444')
-    selenium_url = os.environ.get('SELENIUM_URL', 'http://selenium:4444/wd/hub')
+    selenium_url = selenium_server_url()
+
+    # urllib3 keeps a single connection per host by default; size the pool to the number of threads
+    client_config = ClientConfig(
+        remote_server_addr=selenium_url,
+        init_args_for_pool_manager={"init_args_for_pool_manager": {"maxsize": pool_maxsize}}
+    )
 
     driver = webdriver.Remote(
         command_executor=selenium_url,
-        options=chrome_options
+        options=chrome_options,
+        client_config=client_config
     )
 
     # Set timeouts
@@ -56,9 +176,187 @@ def init_driver():
     # Execute script to remove webdriver flag
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
 
+    block_heavy_resources(driver)
+
     return driver
 
 
+def execute_cdp(driver, cmd, params=None):
+    """Run a Chrome DevTools Protocol command through the remote WebDriver"""
+    return driver.execute("executeCdpCommand", {"cmd": cmd, "params": params or {}})["value"]
+
+
+def block_heavy_resources(driver):
+    """Stop the current tab from downloading images, fonts, media and trackers"""
+    try:
+        execute_cdp(driver, "Network.enable")
+        # Keep the HTTP cache on so shared scripts are not re-downloaded for every property page
+        execute_cdp(driver, "Network.setCacheDisabled", {"cacheDisabled": False})
+        execute_cdp(driver, "Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        logger.warning(f"Could not set blocked URLs: {e}")
+
+
+def purge_browser_memory(driver):
+    """Force a JS garbage collection and drop Chrome's HTTP cache"""
+    try:
+        execute_cdp(driver, "HeapProfiler.collectGarbage")
+        execute_cdp(driver, "Network.clearBrowserCache")
+    except Exception as e:
+        logger.warning(f"Could not purge browser memory: {e}")
+
+
+def recycle_tab(driver):
+    """Open a fresh tab and close the current one so its renderer memory is released"""
+    try:
+        old_handle = driver.current_window_handle
+        driver.switch_to.new_window('tab')
+        new_handle = driver.current_window_handle
+        driver.switch_to.window(old_handle)
+        driver.close()
+        driver.switch_to.window(new_handle)
+        block_heavy_resources(driver)  # URL blocking is per tab
+    except Exception as e:
+        logger.warning(f"Could not recycle browser tab: {e}")
+
+
+def maintain_driver(driver, processed):
+    """Periodic housekeeping that keeps Chrome's memory bounded on long runs"""
+    if processed % PURGE_EVERY_N_PAGES == 0:
+        purge_browser_memory(driver)
+    if processed % RECYCLE_TAB_EVERY_N_PAGES == 0:
+        recycle_tab(driver)
+
+
+def backoff_after_error():
+    """Short random pause so workers do not retry against Booking in lockstep"""
+    time.sleep(random.uniform(*ERROR_BACKOFF_S))
+
+
+def selenium_server_url():
+    """Selenium Hub/Node URL, by default the service name from docker-compose.yml"""
+    return os.environ.get('SELENIUM_URL', 'http://selenium:4444/wd/hub')
+
+
+def grid_session_limit():
+    """Total browser sessions the Selenium node(s) accept, from the /status endpoint; None when unknown"""
+    try:
+        response = requests.get(selenium_server_url().rstrip('/') + '/status', timeout=5)
+        response.raise_for_status()
+        nodes = response.json()['value']['nodes']
+        return sum(node.get('maxSessions') or len(node.get('slots', [])) for node in nodes) or None
+    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Could not read the Selenium session limit: {e}")
+        return None
+
+
+def default_worker_count():
+    """Number of worker threads: SCRAPER_WORKERS, else 5 per core capped by memory and by the node's sessions.
+
+    When the node's session limit cannot be read, one worker is used, so extra workers never wait on
+    sessions the node will not grant.
+    """
+    configured = os.environ.get('SCRAPER_WORKERS')
+    if configured:
+        configured = configured.strip()
+        if not configured.isdigit() or int(configured) < 1:
+            raise ValueError(f"SCRAPER_WORKERS must be a positive integer, got {configured!r}")
+        return int(configured)
+
+    workers = min(MAX_WORKERS, (os.cpu_count() or 1) * 5)
+    try:
+        total_mb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+        workers = min(workers, total_mb // DRIVER_MEMORY_MB)
+    except (AttributeError, ValueError, OSError):
+        pass  # sysconf not available on this platform
+    workers = min(workers, grid_session_limit() or 1)
+    return max(1, workers)
+
+
+class DriverPool:
+    """LIFO pool of remote Chrome drivers, created lazily and reused by worker threads"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._live = set()  # every driver started by the pool, idle or checked out
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)  # remote sessions hold hub slots until quit
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+
+    def acquire(self):
+        """Return an idle driver, starting a new one only while the pool is below max_size"""
+        self._check_open()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            return self._new_driver()
+        while True:
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                self._check_open()  # do not wait forever on a pool that close() emptied
+
+    def release(self, driver):
+        if not self._closed:  # after close() the driver has already been quit
+            self._idle.put(driver)
+
+    def replace(self, driver):
+        """Quit a broken driver and return a fresh one in its slot"""
+        with self._lock:
+            self._live.discard(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        return self._new_driver()
+
+    def close(self):
+        """Quit every driver the pool started, including ones never released"""
+        with self._lock:
+            self._closed = True
+            drivers, self._live = self._live, set()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.error(f"Error closing driver: {e}")
+
+    def _new_driver(self):
+        try:
+            self._check_open()
+            driver = init_driver(pool_maxsize=self.max_size)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            if not self._closed:
+                self._live.add(driver)
+                return driver
+        # close() ran while Chrome was starting
+        driver.quit()
+        raise RuntimeError("Driver pool is closed")
+
+
 def build_urls(destinations):
     """Build search URLs for multiple destinations"""
     base_url = "https://www.booking.com/searchresults.html?"
@@ -81,9 +379,122 @@ def build_urls(destinations):
     return urls
 
 
-def scrape_property_urls(urls, max_links=500):
-    """Scrape property URLs from search results until reaching max_links"""
-    driver = init_driver()
+RESULT_LINK_CSS = 'a[data-testid="title-link"]'
+
+# Flags window.__newResults whenever nodes are added under the results list
+JS_WATCH_RESULTS = """
+window.__newResults = false;
+if (!window.__resultsObserver) {
+    window.__resultsObserver = new MutationObserver(function (mutations) {
+        for (const m of mutations) {
+            if (m.addedNodes.length) { window.__newResults = true; return; }
+        }
+    });
+    const card = document.querySelector('[data-testid="property-card"]');
+    const root = card && card.parentNode ? card.parentNode : document.body;
+    window.__resultsObserver.observe(root, {childList: true, subtree: true});
+}
+"""
+
+# Result count, or -1 while the observer has seen nothing new since the last check
+JS_NEW_RESULT_COUNT = """
+if (window.__resultsObserver && !window.__newResults) return -1;
+window.__newResults = false;
+return document.querySelectorAll('%s').length;
+""" % RESULT_LINK_CSS
+
+# Property link selectors on search result pages, tried in order on a local snapshot
+PROPERTY_LINK_SELECTORS = [
+    '//a[@data-testid="title-link"]',
+    '//h3[@data-testid="title"]/a',
+    '//div[@data-testid="property-card"]//a[contains(@href, "/hotel/")]',
+    '//a[contains(@class, "e13098a59f") and contains(@href, "/hotel/")]',
+    '//a[contains(@href, "/hotel/") and not(contains(@href, "#"))]',
+    '//div[contains(@class, "sr_property_block")]//a[contains(@class, "hotel_name_link")]',
+    '//a[contains(@class, "js-sr-hotel-link")]',
+]
+XP_PROPERTY_LINKS = [(selector, etree.XPath(selector + '/@href')) for selector in PROPERTY_LINK_SELECTORS]
+
+
+def count_result_links(driver):
+    """Number of property cards currently rendered in the search results"""
+    return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", RESULT_LINK_CSS)
+
+
+def watch_results(driver):
+    """Install the result-list MutationObserver once per search page"""
+    driver.execute_script(JS_WATCH_RESULTS)
+
+
+def wait_for_more_results(driver, last_count, timeout=10):
+    """Wait until more than last_count result cards are rendered; False on timeout"""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+            lambda d: d.execute_script(JS_NEW_RESULT_COUNT) > last_count
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+def add_property_links(tree, base_url, all_urls, seen, max_links):
+    """Append unseen property links of a results page to all_urls; returns how many were new, None if no selector matched"""
+    for selector, xpath in XP_PROPERTY_LINKS:
+        hrefs = xpath(tree)
+        if not hrefs:
+            continue
+        logger.debug(f"Found {len(hrefs)} links with selector: {selector}")
+
+        added = 0
+        for href in hrefs:
+            if len(all_urls) >= max_links:
+                break
+
+            href = urljoin(base_url, href)
+            if '/hotel/' in href:
+                canonical = href.split('?')[0]
+                if canonical not in seen:
+                    seen.add(canonical)
+                    all_urls.append(href)
+                    added += 1
+        return added
+    return None
+
+
+def scrape_property_urls_http(urls, max_links=500):
+    """Collect property URLs by paging searchresults.html with offset=, without a browser"""
+    all_urls = []
+    seen = set()
+
+    with requests.Session() as session:  # one keep-alive connection for every results page
+        session.headers.update(HTTP_HEADERS)
+        for search_url in urls:
+            offset = 0
+            while len(all_urls) < max_links:
+                try:
+                    response = session.get(f"{search_url}&offset={offset}", timeout=HTTP_TIMEOUT)
+                    response.raise_for_status()
+                except requests.RequestException as e:
+                    logger.warning(f"Search page request failed: {e}")
+                    break
+
+                # A page with no new property (end of results, or a bot check) ends this destination
+                added = add_property_links(lxml.html.fromstring(response.content), search_url, all_urls, seen, max_links)
+                if not added:
+                    break
+                logger.info(f"Collected {len(all_urls)} unique properties so far")
+                offset += SEARCH_PAGE_SIZE
+
+    return all_urls
+
+
+def scrape_property_urls(urls, max_links=500, driver_pool=None):
+    """Scrape property URLs from search results until reaching max_links.
+
+    With a driver_pool the search browser is borrowed from it and handed back afterwards, so the property
+    scrape reuses that Chrome session instead of starting another one.
+    """
+    driver = driver_pool.acquire() if driver_pool else init_driver()
     all_urls = []
     seen = set()  # Track canonical property URLs to avoid duplicates
 
@@ -92,9 +503,10 @@ def scrape_property_urls(urls, max_links=500):
             if len(all_urls) >= max_links:
                 break
 
-            print(f"Navigating to: {search_url}")
+            logger.info(f"Navigating to: {search_url}")
             driver.get(search_url)
-            time.sleep(3)  # Give page more time to load
+            wait_for_more_results(driver, 0)  # first result cards rendered
+            watch_results(driver)
 
             # Handle cookie consent
             try:
@@ -102,24 +514,14 @@ def scrape_property_urls(urls, max_links=500):
                     EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
                 )
                 accept_btn.click()
-                print("Cookie consent accepted")
+                logger.info("Cookie consent accepted")
             except TimeoutException:
-                print("No cookie consent button found")
-
-            # Try multiple selectors for property links
-            property_selectors = [
-                '//a[@data-testid="title-link"]',
-                '//h3[@data-testid="title"]/a',
-                '//div[@data-testid="property-card"]//a[contains(@href, "/hotel/")]',
-                '//a[contains(@class, "e13098a59f") and contains(@href, "/hotel/")]',
-                '//a[contains(@href, "/hotel/") and not(contains(@href, "#"))]',
-                '//div[contains(@class, "sr_property_block")]//a[contains(@class, "hotel_name_link")]',
-                '//a[contains(@class, "js-sr-hotel-link")]',
-            ]
-
-            # Initial wait and scroll
+                logger.info("No cookie consent button found")
+
+            # Initial scroll to trigger lazy-loaded cards
+            last_count = count_result_links(driver)
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(3)
+            wait_for_more_results(driver, last_count, timeout=3)
 
             scroll_attempts = 0
             max_scroll_attempts = 10
@@ -129,50 +531,29 @@ def scrape_property_urls(urls, max_links=500):
                     break
 
                 scroll_attempts += 1
-                print(f"Scroll attempt {scroll_attempts}/{max_scroll_attempts}")
+                logger.debug(f"Scroll attempt {scroll_attempts}/{max_scroll_attempts}")
 
-                # Try to find property links with various selectors
-                links_found = False
-                for selector in property_selectors:
-                    try:
-                        links = driver.find_elements(By.XPATH, selector)
-                        if links:
-                            print(f"Found {len(links)} links with selector: {selector}")
-                            links_found = True
-
-                            for link in links:
-                                if len(all_urls) >= max_links:
-                                    break
-
-                                try:
-                                    href = link.get_attribute('href')
-                                    if href and '/hotel/' in href:
-                                        canonical = href.split('?')[0]
-                                        if canonical not in seen:
-                                            seen.add(canonical)
-                                            all_urls.append(href)
-                                except Exception as e:
-                                    print(f"Error extracting href: {e}")
-                            break
-                    except Exception as e:
-                        continue
+                # Try to find property links with various selectors, on one snapshot of the results
+                _, tree = parse_page(driver)
+                links_found = add_property_links(tree, search_url, all_urls, seen, max_links) is not None
 
                 if not links_found:
-                    print("No property links found with any selector")
+                    logger.warning("No property links found with any selector")
 
                     # Check if we're on a captcha or error page
                     page_text = driver.find_element(By.TAG_NAME, 'body').text.lower()
                     if 'captcha' in page_text or 'verify' in page_text:
-                        print("WARNING: Possible captcha detected")
+                        logger.warning("Possible captcha detected")
                     elif 'no properties found' in page_text or 'no results' in page_text:
-                        print("No properties found for this search")
+                        logger.info("No properties found for this search")
                         break
 
                 # Scroll down
+                last_count = count_result_links(driver)
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
 
                 # Try to click "Load more" button
+                clicked_more = False
                 try:
                     load_more_selectors = [
                         "//button[contains(text(), 'Load more')]",
@@ -186,283 +567,656 @@ def scrape_property_urls(urls, max_links=500):
                             more_btn = driver.find_element(By.XPATH, btn_selector)
                             if more_btn.is_displayed() and more_btn.is_enabled():
                                 driver.execute_script("arguments[0].click();", more_btn)
-                                print(f"Clicked load more button: {btn_selector}")
-                                time.sleep(3)
+                                logger.debug(f"Clicked load more button: {btn_selector}")
+                                clicked_more = True
                                 break
-                        except:
+                        except Exception:
                             continue
-                except:
+                except Exception:
                     pass
 
-                print(f"Collected {len(all_urls)} unique properties so far")
+                # Wait for new cards instead of sleeping; stop once nothing loads and there is no button left
+                if not wait_for_more_results(driver, last_count, timeout=10 if clicked_more else 5) and not clicked_more:
+                    logger.info(f"Collected {len(all_urls)} unique properties, no more results to load")
+                    break
+
+                logger.info(f"Collected {len(all_urls)} unique properties so far")
 
                 # If we haven't found any links after several attempts, break
                 if scroll_attempts > 3 and len(all_urls) == 0:
-                    print("No properties found after multiple attempts, moving to next destination")
+                    logger.info("No properties found after multiple attempts, moving to next destination")
                     break
 
     except Exception as e:
-        print(f"Error in scrape_property_urls: {e}")
+        logger.error(f"Error in scrape_property_urls: {e}")
     finally:
-        driver.quit()
+        if driver_pool:
+            driver_pool.release(driver)
+        else:
+            driver.quit()
 
     return all_urls
 
 
-def get_location_details(lat, lon):
-    """Reverse-geocode latitude/longitude to address, zone and city (using Nominatim)."""
+def url_cache_path(destinations, max_links):
+    """Cache file for a destination set (search URLs are dated, so the check-in date is part of the key)"""
+    key = json.dumps([sorted(city.lower() for city in destinations), max_links, date.today().isoformat()])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(URL_CACHE_DIR, f'url_list_{digest}.json')
+
+
+def get_property_urls(destinations, max_links=500, driver_pool=None):
+    """Return property URLs for the destinations, reusing a fresh on-disk result when available"""
+    cache_path = url_cache_path(destinations, max_links)
+
+    if URL_CACHE_TTL:
+        try:
+            age = time.time() - os.path.getmtime(cache_path)
+            if age < URL_CACHE_TTL:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    property_urls = json.load(f)
+                logger.info(f"Loaded {len(property_urls)} property URLs from cache ({age / 60:.0f} min old)")
+                return property_urls
+        except (OSError, ValueError):
+            pass  # no usable cache entry - scrape below
+
+    logger.info(f"Generating URLs for: {destinations}")
+    search_urls = build_urls(destinations)
+
+    logger.info("Scraping property URLs...")
+    property_urls = scrape_property_urls_http(search_urls, max_links=max_links)
+    if not property_urls:
+        logger.info("No results over HTTP, scraping property URLs with the browser")
+        property_urls = scrape_property_urls(search_urls, max_links=max_links, driver_pool=driver_pool)
+
+    # Only cache successful scrapes so a blocked run is retried next time
+    if property_urls and URL_CACHE_TTL:
+        try:
+            os.makedirs(URL_CACHE_DIR, exist_ok=True)
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(property_urls, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write URL cache: {e}")
+
+    return property_urls
+
+
+def row_timestamp():
+    """Current time as 'YYYY-MM-DD HH:MM:SS' (isoformat, without parsing a strftime pattern per row)"""
+    return datetime.now().isoformat(' ', 'seconds')
+
+
+def error_text(error):
+    """scrape_error value for an exception (what --retry-failed keys on)"""
+    return repr(error)[:200]
+
+
+def error_record(url, error):
+    """Output row for a property that could not be scraped, so a retry run can select it"""
+    return {
+        'property_id': str(uuid.uuid4()),
+        'scrape_timestamp': row_timestamp(),
+        'property_url': url,
+        'scrape_error': error_text(error),
+    }
+
+
+def failed_urls(csv_filename):
+    """Property URLs that a previous run wrote with a scrape_error"""
+    opener = gzip.open if csv_filename.endswith('.gz') else open
+    with opener(csv_filename, 'rt', newline='', encoding='utf-8') as csvfile:
+        return dedupe_urls(row['property_url'] for row in csv.DictReader(csvfile) if row.get('scrape_error'))
+
+
+def dedupe_urls(urls):
+    """Drop repeated property URLs (ignoring query strings) while keeping the original order"""
+    unique = {}
+    for url in urls:
+        unique.setdefault(url.split('?')[0], url)
+    return list(unique.values())
+
+
+_geocode_lock = threading.Lock()
+_geocode_db = None
+_geocoder = None
+_pending_locations = 0  # scraped rows waiting for reverse geocoding before they are written
+_pending_cond = threading.Condition()
+
+
+def geocode_cache():
+    """Open (once) the SQLite cache of reverse-geocoding results"""
+    global _geocode_db
+    if _geocode_db is None:
+        os.makedirs(os.path.dirname(GEOCODE_CACHE_PATH), exist_ok=True)
+        _geocode_db = sqlite3.connect(GEOCODE_CACHE_PATH, check_same_thread=False)
+        _geocode_db.execute(
+            "CREATE TABLE IF NOT EXISTS locations (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+    return _geocode_db
+
+
+def geocode_cache_get(key):
+    """Return a cached location dict, or None when missing or expired"""
     try:
+        with _geocode_lock:
+            row = geocode_cache().execute(
+                "SELECT value, created FROM locations WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read geocode cache: {e}")
+        return None
+    if row and time.time() - row[1] < GEOCODE_CACHE_TTL:
+        return json.loads(row[0])
+    return None
+
+
+def geocode_cache_put(key, location):
+    try:
+        with _geocode_lock:
+            db = geocode_cache()
+            db.execute("INSERT OR REPLACE INTO locations VALUES (?, ?, ?)",
+                       (key, json.dumps(location), time.time()))
+            db.commit()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not write geocode cache: {e}")
+
+
+class Geocoder:
+    """Reverse-geocode on one asyncio thread so scraper threads only wait on a future"""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='geocoder', daemon=True)
+        self._thread.start()
+        self._session = None  # aiohttp objects are created on the loop thread
+        self._pace = None
+        self._last_call = 0.0
+        atexit.register(self.close)
+
+    def lookup(self, lat, lon, cache_key):
+        """Schedule a Nominatim lookup; returns a concurrent.futures.Future of the location dict"""
+        return asyncio.run_coroutine_threadsafe(self._lookup(lat, lon, cache_key), self._loop)
+
+    async def _lookup(self, lat, lon, cache_key):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=1),
+                timeout=aiohttp.ClientTimeout(total=15),
+                headers={"User-Agent": "BookingScraper/1.0 (contact@example.com)"},
+            )
+            self._pace = asyncio.Lock()
+
         url = (
             "https://nominatim.openstreetmap.org/reverse?format=json"
             f"&lat={lat}&lon={lon}&accept-language=en"
         )
-        headers = {
-            "User-Agent": "BookingScraper/1.0 (contact@example.com)"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        address_components = data.get("address", {})
-        latin_pattern = re.compile(r"[^a-zA-Z0-9\s\-,\.']")
-
-        # Raw display name cleaned
-        address = latin_pattern.sub("", data.get("display_name", "")).strip()
-        if address:
-            address = address.replace(",", " ")
-
-        # Extract zone (neighbourhood/suburb...)
-        zone = None
-        for field in [
-            "neighbourhood",
-            "suburb",
-            "quarter",
-            "city_district",
-            "district",
-        ]:
-            if field in address_components and address_components[field]:
-                zone = latin_pattern.sub("", address_components[field]).strip()
-                if zone:
-                    break
+        try:
+            # One request at a time, at least NOMINATIM_MIN_INTERVAL apart
+            async with self._pace:
+                wait = self._last_call + NOMINATIM_MIN_INTERVAL - self._loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    async with self._session.get(url) as response:
+                        response.raise_for_status()
+                        data = await response.json()
+                finally:
+                    self._last_call = self._loop.time()
+
+            location = parse_location(data)
+            geocode_cache_put(cache_key, location)
+            return location
+
+        except Exception as e:
+            logger.error(f"Error getting location: {e}")
+            return {"address": None, "zone": None, "city": None}
 
-        # Extract city
-        city = None
-        for field in ["city", "town", "municipality", "village"]:
-            if field in address_components and address_components[field]:
-                city = address_components[field].strip()
+    def close(self):
+        """Close the HTTP session and stop the event loop thread"""
+        if self._loop.is_closed():
+            return
+        try:
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+def get_geocoder():
+    """Return the process-wide Geocoder, starting it on first use"""
+    global _geocoder
+    with _geocode_lock:
+        if _geocoder is None:
+            _geocoder = Geocoder()
+        return _geocoder
+
+
+def parse_location(data):
+    """Turn a Nominatim reverse response into address, zone and city"""
+    address_components = data.get("address", {})
+
+    # Raw display name cleaned
+    address = LATIN_RE.sub("", data.get("display_name", "")).strip()
+    if address:
+        address = address.replace(",", " ")
+
+    # Extract zone (neighbourhood/suburb...)
+    zone = None
+    for field in [
+        "neighbourhood",
+        "suburb",
+        "quarter",
+        "city_district",
+        "district",
+    ]:
+        if field in address_components and address_components[field]:
+            zone = LATIN_RE.sub("", address_components[field]).strip()
+            if zone:
                 break
 
-        return {"address": address, "zone": zone, "city": city}
+    # Extract city
+    city = None
+    for field in ["city", "town", "municipality", "village"]:
+        if field in address_components and address_components[field]:
+            city = address_components[field].strip()
+            break
 
-    except Exception as e:
-        print(f"Error getting location: {e}")
-        return {"address": None, "zone": None, "city": None}
+    return {"address": address, "zone": zone, "city": city}
 
 
-def extract_prices(driver):
-    """Return (min_price, max_price) from current Booking.com property page."""
-    prices = []
+def get_location_details_async(lat, lon):
+    """Start reverse-geocoding latitude/longitude; returns a Future of address, zone and city."""
+    lat, lon = round(float(lat), GEOCODE_PRECISION), round(float(lon), GEOCODE_PRECISION)
+    cache_key = f"{lat},{lon}"
+    cached = geocode_cache_get(cache_key)
+    if cached is not None:
+        future = Future()
+        future.set_result(cached)
+        return future
+    return get_geocoder().lookup(lat, lon, cache_key)
+
+
+def get_location_details(lat, lon):
+    """Reverse-geocode latitude/longitude to address, zone and city (using Nominatim)."""
+    return get_location_details_async(lat, lon).result()
+
+
+def submit_with_location(csv_writer, data):
+    """Queue a scraped property for writing; rows with coordinates are written once geocoding completes"""
+    global _pending_locations
+    lat, lon = data.get('latitude'), data.get('longitude')
+    if not (lat and lon):
+        csv_writer.submit(data)
+        return
+
+    def located(future):
+        global _pending_locations
+        try:
+            data.update(future.result())
+        except Exception as e:
+            logger.error(f"Error extracting location: {e}")
+        csv_writer.submit(data)
+        with _pending_cond:
+            _pending_locations -= 1
+            _pending_cond.notify_all()
 
-    # --- Primary (current markup) ---
+    # Nominatim answers one request per second: scraping threads must not wait on it
+    try:
+        future = get_location_details_async(lat, lon)
+    except Exception as e:
+        logger.error(f"Error extracting location: {e}")
+        csv_writer.submit(data)
+        return
+    with _pending_cond:
+        _pending_locations += 1
+    future.add_done_callback(located)
+
+
+def wait_for_locations():
+    """Block until every row handed to submit_with_location has reached its CSV writer"""
+    with _pending_cond:
+        if _pending_locations:
+            logger.info(f"Waiting for {_pending_locations} reverse-geocoding lookups")
+        _pending_cond.wait_for(lambda: _pending_locations == 0)
+
+
+# === PAGE PARSING ===
+# Selectors are compiled once and run on a local lxml tree of driver.page_source,
+# so each lookup is an in-process XPath evaluation instead of a WebDriver round-trip.
+
+
+def css_class(name):
+    """XPath predicate equivalent to the CSS class selector .name"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+XP_BREADCRUMB = etree.XPath('//span[@data-testid="breadcrumb-current"]//span')
+# Current markup: the price spans inside the hprt room table (helper spans elsewhere on the page are not prices)
+XP_PRICE_HELPER = etree.XPath(
+    f'//td[{css_class("hprt-table-cell-price")}]//div[{css_class("hprt-price-block")}]'
+    f'//div[{css_class("prco-wrapper")}]//span[{css_class("prco-valign-middle-helper")}]'
+)
+XP_PRICE_FALLBACKS = [etree.XPath(xp) for xp in (
+    f'//td[{css_class("hp-price-left-align")} and {css_class("hprt-table-cell")} and {css_class("hprt-table-cell-price")}]'
+    f'//div[{css_class("hprt-price-block")}]//span[{css_class("prc-no-css")}]',
+    f'//td[{css_class("hprt-table-cell-price")}]//span[{css_class("prc-no-css")}]',
+    f'//div[{css_class("hprt-price-block")}]//span[{css_class("prc-no-css")}]',
+    '//span[@data-testid="price-and-discounted-price"]',
+    '//div[@data-testid="price-and-discounted-price"]',
+    f'//span[{css_class("hprt-price-price-standard")}]',
+    f'//span[{css_class("fcab3ed991")} and {css_class("bd73d13072")}]',
+)]
+XP_WIFI_SPEED = etree.XPath("//div[contains(text(), 'Mbps')]")
+XP_GENERAL_REVIEW = etree.XPath('//*[@id="js--hp-gallery-scorecard"]/a/div/div/div/div[2]')
+XP_GENERAL_REVIEW_COUNT = etree.XPath('//*[@id="js--hp-gallery-scorecard"]/a/div/div/div/div[4]/div[2]')
+XP_ATLAS_LATLNG = etree.XPath('(//*[@data-atlas-latlng])[1]/@data-atlas-latlng')  # "lat,lng" on the map link
+XP_SUBSCORES = etree.XPath('//div[@data-testid="review-subscore"]//div[@aria-hidden="true"]')
+
+# Regexes run on every page / geocode result
+NON_DIGITS_RE = re.compile(r'\D+')
+PAREN_GROUP_RE = re.compile(r'\(([^)]+)\)')
+CURRENCY_PRICE_RE = re.compile(r'[€$£]\s?(\d{2,5})')
+LATIN_RE = re.compile(r"[^a-zA-Z0-9\s\-,\.']")
+COORD_RE = re.compile(r'"lat(?:itude)?":([0-9.\-]+),"(?:longitude|lng)":([0-9.\-]+)')
+
+
+def parse_page(driver):
+    """Snapshot the current DOM once and return (page_source, lxml tree)"""
+    page_source = driver.page_source
+    return page_source, lxml.html.fromstring(page_source)
+
+
+def node_text(node):
+    """Text of an lxml node with whitespace collapsed, close to WebElement.text"""
+    return " ".join(node.text_content().split())
+
+
+def first_text(xpath, tree, index=0):
+    """Text of the index-th node matched by a compiled XPath, or None"""
+    nodes = xpath(tree)
+    return node_text(nodes[index]) if len(nodes) > index else None
+
+
+def wait_for_property_page(driver, timeout=10):
+    """Wait for the breadcrumb, the first block the property page renders"""
     try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "td.hprt-table-cell-price"))
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-testid="breadcrumb-current"]'))
         )
-        price_elements = driver.find_elements(
-            By.CSS_SELECTOR,
-            "td.hprt-table-cell-price div.hprt-price-block div.prco-wrapper span.prco-valign-middle-helper",
+    except TimeoutException:
+        pass
+
+
+def wait_for_price_table(driver, timeout=2):
+    """Wait briefly for the room/price table so the page snapshot includes prices.
+
+    The table is server-rendered and normally present once the breadcrumb is, so a page without it
+    (no availability) is not held for long.
+    """
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "td.hprt-table-cell-price"))
         )
-        for el in price_elements:
-            txt = el.text.strip()
+    except TimeoutException:
+        pass  # structure changed or no availability - the fallbacks still get a chance
+
+
+def digits_only(text):
+    """Strip every non-digit character ('US$1,050' -> '1050')"""
+    return NON_DIGITS_RE.sub('', text)
+
+
+def extract_prices(tree, page_source):
+    """Return (min_price, max_price) from a parsed Booking.com property page."""
+    prices = []
+
+    # --- Primary (current markup): the price spans of the room table ---
+    for el in XP_PRICE_HELPER(tree):
+        num = digits_only(node_text(el))
+        if num:
+            prices.append(int(num))
+    if prices:
+        return min(prices), max(prices)
+
+    # --- Fallback: generic selectors, stopping at the first one that yields prices ---
+    for xpath in XP_PRICE_FALLBACKS:
+        for el in xpath(tree):
+            txt = node_text(el)
             if not txt:
                 continue
-            num = "".join(filter(str.isdigit, txt))
-            if num:
+            digits = digits_only(txt)
+            if digits:
                 try:
-                    prices.append(int(num))
+                    prices.append(int(digits))
                 except ValueError:
                     pass
-    except Exception:
-        pass  # timeout or structure changed – continue with fallbacks
-
-    # --- Fallback: generic selectors ---
-    if not prices:
-        generic_selectors = [
-            "td.hp-price-left-align.hprt-table-cell.hprt-table-cell-price div.hprt-price-block span.prc-no-css",
-            "td.hprt-table-cell-price span.prc-no-css",
-            "div.hprt-price-block span.prc-no-css",
-            "span[data-testid='price-and-discounted-price']",
-            "div[data-testid='price-and-discounted-price']",
-            "span.hprt-price-price-standard",
-            "span.fcab3ed991.bd73d13072",
-        ]
-        for css in generic_selectors:
-            for el in driver.find_elements(By.CSS_SELECTOR, css):
-                txt = el.text.strip()
-                if not txt:
-                    continue
-                digits = re.findall(r"\d+", txt.replace(",", ""))
-                if digits:
-                    try:
-                        prices.append(int("".join(digits)))
-                    except ValueError:
-                        pass
+        if prices:
+            return min(prices), max(prices)
 
     # --- Final fallback: regex over HTML ---
-    if not prices:
-        matches = re.findall(r"[€$£]\s?(\d{2,5})", driver.page_source)
-        prices.extend([int(m) for m in matches])
-
+    prices = [int(m) for m in CURRENCY_PRICE_RE.findall(page_source)]
     if not prices:
         return None, None
     return min(prices), max(prices)
 
 
-def extract_category(driver):
+def extract_category(tree):
     """Extract property category"""
-    try:
-        element = WebDriverWait(driver, 3).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'span[data-testid="breadcrumb-current"] span'))
-        )
-        text = element.text.strip()
-
-        # Extract category from the SECOND pair of parentheses counting from the end.
-        matches = re.findall(r'\(([^)]+)\)', text)
-        if len(matches) >= 2:
-            category = matches[-2]  # second from the end
-        elif matches:
-            category = matches[-1]  # only one pair present
-        else:
-            category = text
-
-        # Normalize categories
-        if category == 'Guest House':
-            return 'Riad'
-        elif category == 'Condo Hotel':
-            return 'Apartment-Hotel'
-        return category
-    except:
+    text = first_text(XP_BREADCRUMB, tree)
+    if not text:
         return None
 
+    # Extract category from the SECOND pair of parentheses counting from the end.
+    matches = PAREN_GROUP_RE.findall(text)
+    if len(matches) >= 2:
+        category = matches[-2]  # second from the end
+    elif matches:
+        category = matches[-1]  # only one pair present
+    else:
+        category = text
+
+    # Normalize categories
+    if category == 'Guest House':
+        return 'Riad'
+    elif category == 'Condo Hotel':
+        return 'Apartment-Hotel'
+    return category
+
+
+def extract_wifi_speed(tree):
+    """Extract the advertised WiFi speed (e.g. '50 Mbps')"""
+    speed_text = first_text(XP_WIFI_SPEED, tree)
+    return speed_text.split('•')[-1].strip() if speed_text else 'Not specified'
+
+
+def extract_general_review(tree):
+    """Return (general_review, general_review_count) from the gallery scorecard"""
+    general_review = None
+    general_review_count = None
+
+    try:
+        general_review = float(first_text(XP_GENERAL_REVIEW, tree))
+    except (TypeError, ValueError):
+        pass
+
+    count_text = digits_only(first_text(XP_GENERAL_REVIEW_COUNT, tree) or '')
+    if count_text:
+        general_review_count = int(count_text)
+
+    return general_review, general_review_count
 
-def extract_coordinates(page_source):
-    """Extract coordinates from page source"""
-    patterns = [
-        r'"latitude":([0-9\.\-]+),"longitude":([0-9\.\-]+)',
-        r'"lat":([0-9\.\-]+),"lng":([0-9\.\-]+)',
-    ]
 
-    for pattern in patterns:
-        match = re.search(pattern, page_source)
-        if match:
+def extract_subscore(tree, index):
+    """Return the index-th review subscore (0-based) as a float, or None"""
+    try:
+        return float(first_text(XP_SUBSCORES, tree, index))
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_coordinates(page_source, tree=None):
+    """Extract coordinates from the map link attribute, else from the first usable pair in the page source"""
+    if tree is not None:
+        for latlng in XP_ATLAS_LATLNG(tree):
             try:
-                return float(match.group(1)), float(match.group(2))
-            except (ValueError, IndexError):
-                continue
+                lat, lon = latlng.split(',')
+                return float(lat), float(lon)
+            except ValueError:
+                pass  # malformed attribute - scan the page source below
+
+    for match in COORD_RE.finditer(page_source):
+        try:
+            return float(match.group(1)), float(match.group(2))
+        except ValueError:
+            continue
     return None, None
 
 
-def scrape_property_data(driver, url, thread_id=None):
-    """Scrape basic data for a single property"""
-    prefix = f"Thread {thread_id}: " if thread_id else ""
-    print(f"{prefix}Scraping: {url}")
+def new_property_record(url):
+    """Empty output row for a property (a copy of the all-None field template)"""
+    data = _DATA_TEMPLATE.copy()
+    data['property_id'] = str(uuid.uuid4())
+    data['scrape_timestamp'] = row_timestamp()
+    data['property_url'] = url
+    return data
 
-    data = {
-        'property_id': str(uuid.uuid4()),
-        'scrape_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'property_url': url,
-        'category': None,
-        'general_review': None,
-        'general_review_count': None,
-        'wifi_score': None,
-        'min_price': None,
-        'max_price': None,
-        'latitude': None,
-        'longitude': None,
-        'address': None,
-        'zone': None,
-        'city': None,
-        'wifi_speed': None,
-    }
 
+def extract_property_fields(data, page_source, tree, prefix=""):
+    """Fill data from a property page snapshot (address, zone and city come later, from submit_with_location)"""
     try:
-        driver.get(url)
-        time.sleep(2)
+        lat, lon = extract_coordinates(page_source, tree)
+        if lat and lon:
+            data['latitude'] = lat
+            data['longitude'] = lon
+    except Exception as e:
+        logger.error(f"{prefix}Error extracting location: {e}")
 
-        # Extract category
-        data['category'] = extract_category(driver)
+    # Extract category
+    data['category'] = extract_category(tree)
 
-        # Extract prices (min_price & max_price)
-        try:
-            min_p, max_p = extract_prices(driver)
-            data['min_price'] = min_p
-            data['max_price'] = max_p
-        except Exception as e:
-            print(f"{prefix}Error extracting prices: {e}")
+    # Extract prices (min_price & max_price)
+    try:
+        min_p, max_p = extract_prices(tree, page_source)
+        data['min_price'] = min_p
+        data['max_price'] = max_p
+    except Exception as e:
+        logger.error(f"{prefix}Error extracting prices: {e}")
 
-        # Extract WiFi speed
-        try:
-            speed_element = driver.find_element(By.XPATH, "//div[contains(text(), 'Mbps')]")
-            data['wifi_speed'] = speed_element.text.split('•')[-1].strip()
-        except:
-            data['wifi_speed'] = 'Not specified'
+    # Extract WiFi speed
+    data['wifi_speed'] = extract_wifi_speed(tree)
 
-        # Extract basic review info
-        try:
-            # General review score
-            general_element = WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, '//*[@id="js--hp-gallery-scorecard"]/a/div/div/div/div[2]'))
-            )
-            data['general_review'] = float(general_element.get_attribute("textContent"))
-        except:
-            pass
+    # Extract basic review info
+    data['general_review'], data['general_review_count'] = extract_general_review(tree)
 
-        try:
-            # General review count
-            count_element = driver.find_element(By.XPATH,
-                                                '//*[@id="js--hp-gallery-scorecard"]/a/div/div/div/div[4]/div[2]')
-            count_text = ''.join(filter(str.isdigit, count_element.text))
-            if count_text:
-                data['general_review_count'] = int(count_text)
-        except:
-            pass
+    # Extract WiFi score (7th review subscore)
+    data['wifi_score'] = extract_subscore(tree, 6)
+    if data['wifi_score'] is None:
+        logger.warning(f"{prefix}WiFi score not found")
 
-        # Extract WiFi score from reviews section
+
+def scrape_property_data(driver, url, thread_id=None):
+    """Scrape basic data for a single property"""
+    prefix = f"Thread {thread_id}: " if thread_id else ""
+    logger.info(f"{prefix}Scraping: {url}")
+
+    data = new_property_record(url)
+
+    try:
+        driver.get(url)
+        wait_for_property_page(driver)
+        wait_for_price_table(driver)
+
+        # Open the reviews panel first so the WiFi subscore is part of the page snapshot
         try:
-            # Navigate to reviews to get WiFi score
             review_btn = WebDriverWait(driver, 10).until(
                 EC.element_to_be_clickable((By.XPATH, "//*[@id='js--hp-gallery-scorecard']"))
             )
             review_btn.click()
-            time.sleep(2)
-
-            # Extract WiFi score
-            wifi_element = driver.find_element(
-                By.XPATH, '(//div[@data-testid="review-subscore"]//div[@aria-hidden="true"])[7]'
+            WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="review-subscore"]'))
             )
-            data['wifi_score'] = float(wifi_element.get_attribute("textContent"))
         except Exception as e:
-            print(f"{prefix}Error extracting WiFi score: {e}")
+            logger.error(f"{prefix}Error opening reviews: {e}")
 
-        # Extract coordinates and location
-        try:
-            lat, lon = extract_coordinates(driver.page_source)
-            if lat and lon:
-                data['latitude'] = lat
-                data['longitude'] = lon
-
-                location = get_location_details(lat, lon)
-                data.update(location)
-        except Exception as e:
-            print(f"{prefix}Error extracting location: {e}")
+        # Everything below is parsed locally from one DOM snapshot
+        page_source, tree = parse_page(driver)
+        extract_property_fields(data, page_source, tree, prefix)
 
+    except InvalidSessionIdException:
+        raise  # dead browser session - let the worker replace the driver
     except Exception as e:
-        print(f"{prefix}Error scraping property: {e}")
+        # Keep the partial row, but mark it so --retry-failed picks the URL up again
+        logger.error(f"{prefix}Error scraping property: {e}")
+        data['scrape_error'] = error_text(e)
 
     return data
 
 
+async def fetch_property_http(session, semaphore, url):
+    """Scrape one property from its server-rendered HTML; returns (url, data), data None when it needs a browser"""
+    try:
+        async with semaphore:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                page_source = await response.text()
+        tree = lxml.html.fromstring(page_source)
+    except Exception as e:
+        logger.warning(f"HTTP fetch failed for {url}: {e}")
+        return url, None
+
+    # Anti-bot interstitials and client-rendered pages lack the breadcrumb or the review subscores
+    if first_text(XP_BREADCRUMB, tree) is None or extract_subscore(tree, 6) is None:
+        return url, None
+
+    data = new_property_record(url)
+    extract_property_fields(data, page_source, tree)
+    return url, data
+
+
+async def scrape_properties_http_async(urls, csv_writer):
+    """Scrape urls concurrently over one HTTP session; returns the URLs that still need a browser"""
+    needs_browser = []
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=HTTP_MAX_CONNECTIONS),
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        headers=HTTP_HEADERS,
+    ) as session:
+        semaphore = asyncio.Semaphore(HTTP_CONCURRENCY)
+
+        async def run(batch):
+            scraped = 0
+            for next_done in asyncio.as_completed([fetch_property_http(session, semaphore, url) for url in batch]):
+                url, data = await next_done
+                if data is None:
+                    needs_browser.append(url)
+                else:
+                    submit_with_location(csv_writer, data)
+                    scraped += 1
+            return scraped
+
+        probe, rest = urls[:HTTP_PROBE_PAGES], urls[HTTP_PROBE_PAGES:]
+        if probe and await run(probe) == 0:
+            logger.info("Property pages need a browser, skipping HTTP fetching for this run")
+            return needs_browser + rest
+        await run(rest)
+
+    return needs_browser
+
+
+def scrape_properties_http(urls, csv_writer):
+    """Scrape what can be scraped without Chrome; returns the URLs left for the Selenium workers"""
+    if not HTTP_FIRST or not urls:
+        return urls
+    logger.info(f"Fetching {len(urls)} property pages over HTTP...")
+    remaining = asyncio.run(scrape_properties_http_async(urls, csv_writer))
+    logger.info(f"Scraped {len(urls) - len(remaining)} properties over HTTP, {len(remaining)} left for the browser")
+    return remaining
+
+
 def get_all_possible_fields():
     """Define all possible CSV fields to ensure consistent column ordering"""
     return [
@@ -480,216 +1234,462 @@ def get_all_possible_fields():
         'address',
         'zone',
         'city',
-        'wifi_speed'
+        'wifi_speed',
+        'scrape_error'
     ]
 
 
-def save_to_csv(data_list, filename):
-    """Thread-safe CSV writing with proper field handling"""
-    if not data_list:
-        return
+# Every output row starts as a copy of this, so fields come out in CSV column order
+_DATA_TEMPLATE = dict.fromkeys(get_all_possible_fields())
 
-    fieldnames = get_all_possible_fields()
 
-    with csv_lock:
-        # Check if file exists
-        file_exists = False
-        try:
-            with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
-                file_exists = True
-        except FileNotFoundError:
-            pass
+def estimate_item_bytes(item):
+    """Rough in-memory footprint of one scraped property dict"""
+    return sys.getsizeof(item) + sum(sys.getsizeof(v) for v in item.values())
+
+
+class BatchSizer:
+    """Decide when the CSV writer should flush its batch, adapting the size when batch_size="auto"."""
+
+    def __init__(self, batch_size):
+        self.auto = batch_size == 'auto'
+        self.size = AUTO_BATCH_MIN if self.auto else batch_size
+        self.ema_flush_ms = None
+        self.pending_bytes = 0
+
+    def track(self, item):
+        """Account for an item appended to the pending batch"""
+        if self.auto:
+            self.pending_bytes += estimate_item_bytes(item)
+
+    def should_flush(self, batch):
+        return len(batch) >= self.size or self.pending_bytes > SOFT_MAX_BYTES
 
-        mode = 'a' if file_exists else 'w'
+    def record_flush(self, elapsed_ms):
+        """Update the flush EMA and grow/shrink the batch size accordingly"""
+        if not self.auto:
+            return
 
-        with open(filename, mode, newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        alpha = 2 / (FLUSH_EMA_WINDOW + 1)
+        if self.ema_flush_ms is None:
+            self.ema_flush_ms = elapsed_ms
+        else:
+            self.ema_flush_ms = alpha * elapsed_ms + (1 - alpha) * self.ema_flush_ms
+
+        if self.pending_bytes > SOFT_MAX_BYTES:
+            self.shrink()
+        elif self.ema_flush_ms < FAST_FLUSH_MS:
+            self.size = min(self.size * 2, AUTO_BATCH_MAX)
+        self.pending_bytes = 0
+
+    def shrink(self):
+        """Halve the batch size (memory pressure)"""
+        if self.auto:
+            self.size = max(AUTO_BATCH_MIN, self.size // 2)
+
+
+class ThreadSafeCSVWriter:
+    """Append scraped properties to one CSV file from a single background writer thread"""
+
+    _STOP = object()
+    _FLUSH = object()
+
+    def __init__(self, filename, batch_size='auto'):
+        self.filename = filename
+        # The schema is fixed up front, so every batch is a plain append
+        self.fieldnames = get_all_possible_fields()
+        self._buffer = io.StringIO()  # rows are formatted here, then written to the file in one call
+        self._writer = csv.writer(self._buffer)
+        self._row = self._compile_row()
+        self._known_fields = set(self.fieldnames)
+        self._dropped_fields = set()  # fields not in the schema, reported once
+        self._sizer = BatchSizer(batch_size)
+        self.rows_written = 0
+        self._compress = filename.endswith('.gz')
+
+        # One unbuffered handle for the whole run, so each batch is one write syscall;
+        # appending to a non-empty file skips the header
+        self._file = open(self.filename, 'ab', buffering=0)
+        if self._file.tell() == 0:
+            self._writer.writerow(self.fieldnames)
+            self._write_buffer()
+        atexit.register(self.close)
+
+        # Workers only put rows on the queue; the writer thread owns the file.
+        # The queue is bounded so a stalled disk slows the workers instead of growing memory.
+        self._queue = queue.Queue(maxsize=WRITER_QUEUE_MAX)
+        self._thread = threading.Thread(target=self._run, name='csv-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, data):
+        """Queue one scraped property for writing (blocks only while the queue is full)"""
+        self._queue.put(data)
+
+    def relieve_memory(self):
+        """Ask the writer to flush now and use smaller batches (memory pressure)"""
+        self._queue.put(self._FLUSH)
+
+    def _run(self):
+        """Writer thread: batch queued rows and flush on size, idle time, max delay, or shutdown"""
+        batch = []
+        deadline = None  # flush time for the oldest pending row
+        while True:
+            timeout = WRITER_IDLE_FLUSH_S
+            if deadline is not None:
+                timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None  # idle or max delay reached - flush whatever is pending
 
-            # Write header only for new files
-            if not file_exists:
-                writer.writeheader()
+            if item is self._STOP:
+                break
+            if item is self._FLUSH:
+                self._sizer.shrink()
+                item = None
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + WRITER_MAX_DELAY_S
+                batch.append(item)
+                self._sizer.track(item)
+                if not self._sizer.should_flush(batch) and time.monotonic() < deadline:
+                    continue
 
-            for item in data_list:
-                # Prepare row with proper default values
-                row = {}
-                for field in fieldnames:
-                    if field in item and item[field] is not None:
-                        row[field] = item[field]
-                    else:
-                        # Set appropriate default values
-                        if field in ['category', 'address', 'zone', 'city', 'wifi_speed']:
-                            row[field] = ''  # Empty string for text fields
-                        elif field in ['latitude', 'longitude']:
-                            row[field] = ''  # Empty string for coordinates
-                        else:
-                            row[field] = 0  # Zero for numeric fields
+            if batch:
+                self._flush(batch)
+                batch = []
+            deadline = None
 
-                writer.writerow(row)
+        if batch:
+            self._flush(batch)
 
-    print(f"Saved {len(data_list)} properties to {filename}")
+    def _flush(self, batch):
+        """Write a batch and feed the flush time back to the sizer"""
+        started = time.perf_counter()
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            logger.error(f"Could not write {len(batch)} properties to {self.filename}: {e}")
+        self._sizer.record_flush((time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    def _default_for(field):
+        """Value written when a property has no value (or None) for field"""
+        if field in ['category', 'address', 'zone', 'city', 'wifi_speed', 'scrape_error']:
+            return ''  # Empty string for text fields
+        elif field in ['latitude', 'longitude']:
+            return ''  # Empty string for coordinates
+        return 0  # Zero for numeric fields
+
+    def _compile_row(self):
+        """Generate a row function with this header's field lookups and defaults inlined"""
+        columns = ''.join(
+            f"        v if (v := get({field!r})) is not None else {self._default_for(field)!r},\n"
+            for field in self.fieldnames
+        )
+        namespace = {}
+        exec(f"def row(item):\n    get = item.get\n    return (\n{columns}    )\n", namespace)
+        return namespace['row']
+
+    def write_batch(self, data_list):
+        """Append a batch of scraped properties (called from the writer thread only)"""
+        if not data_list:
+            return
+
+        self._log_new_fields(data_list)
+        self._writer.writerows(map(self._row, data_list))
+        self._write_buffer()
+
+        self.rows_written += len(data_list)
+        logger.info(f"Saved {len(data_list)} properties to {self.filename} ({self.rows_written} total)")
+
+    def _write_buffer(self):
+        """Move the formatted rows to the file in one write call (as one gzip member for .gz output)"""
+        payload = self._buffer.getvalue().encode('utf-8')
+        if self._compress:
+            payload = gzip.compress(payload, compresslevel=GZIP_LEVEL)
+        data = memoryview(payload)
+        while data:
+            data = data[self._file.write(data):]  # raw writes may be partial
+
+        if self._buffer.tell() > WRITER_BUFFER_KEEP:
+            self._buffer = io.StringIO()
+            self._writer = csv.writer(self._buffer)
+        else:
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+    def _log_new_fields(self, data_list):
+        """The header is fixed: report (once) any field that will be dropped"""
+        # Rows normally carry only schema keys, so a C-level subset test per row is all this costs
+        known = self._known_fields | self._dropped_fields
+        new_fields = set()
+        for item in data_list:
+            if not item.keys() <= known:
+                new_fields |= item.keys() - known
+        if new_fields:
+            self._dropped_fields |= new_fields
+            logger.warning(f"Dropping fields not in the CSV header of {self.filename}: {sorted(new_fields)}")
+
+    def close(self):
+        """Flush everything still queued, stop the writer thread and close the file"""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        if not self._file.closed:
+            self._file.close()
+
+
+def cancel_pending_urls(url_queue, num_workers):
+    """Drop every URL not yet started and queue fresh stop sentinels, so workers exit after their current property"""
+    dropped = 0
+    while True:
+        try:
+            if url_queue.get_nowait() is not None:
+                dropped += 1
+        except queue.Empty:
+            break
+    for _ in range(num_workers):
+        url_queue.put(None)
+    return dropped
 
 
-def worker_thread(urls_chunk, thread_id, filename, batch_size=5):
-    """Worker function for threading"""
-    print(f"Thread {thread_id}: Starting with {len(urls_chunk)} properties")
+def worker_thread(url_queue, driver_pool, thread_id, csv_writer):
+    """Worker function for threading: pulls URLs from the shared queue until it gets a None sentinel"""
+    logger.info(f"Thread {thread_id}: Starting")
 
-    driver = init_driver()
+    try:
+        driver = driver_pool.acquire()
+    except Exception as e:
+        # URLs are queued ahead of the stop sentinels, so the other workers still get through all of them
+        logger.error(f"Thread {thread_id}: Could not start a browser: {e}")
+        return
 
-    batch = []
     processed = 0
 
     try:
-        for i, url in enumerate(urls_chunk, 1):
+        while True:
+            url = url_queue.get()
+            if url is None:
+                break
+
             try:
-                data = scrape_property_data(driver, url, thread_id)
-                batch.append(data)
+                for attempt in range(1, MAX_DRIVER_ATTEMPTS + 1):
+                    try:
+                        data = scrape_property_data(driver, url, thread_id)
+                        break
+                    except InvalidSessionIdException as e:
+                        session_error = e
+                        logger.warning(f"Thread {thread_id}: Browser session lost (attempt {attempt}/{MAX_DRIVER_ATTEMPTS}): {e}")
+                        try:
+                            driver = driver_pool.replace(driver)
+                        except Exception as restart_error:
+                            # The old driver is already quit and its pool slot freed, so it must not be released;
+                            # the URLs still queued are left to the other workers
+                            logger.error(f"Thread {thread_id}: Could not restart the browser, stopping: {restart_error}")
+                            csv_writer.submit(error_record(url, restart_error))
+                            driver = None
+                            return
+                else:
+                    csv_writer.submit(error_record(url, session_error))  # give up on this URL
+                    continue
+
+                submit_with_location(csv_writer, data)
                 processed += 1
 
-                # Save batch when full or last item
-                if len(batch) >= batch_size or i == len(urls_chunk):
-                    save_to_csv(batch, filename)
-                    batch = []
+                maintain_driver(driver, processed)
 
-                time.sleep(1)  # Small delay between requests
+            except MemoryError as e:
+                logger.warning(f"Thread {thread_id}: Memory pressure, flushing and shrinking batch size")
+                csv_writer.relieve_memory()
+                csv_writer.submit(error_record(url, e))  # so --retry-failed can pick the URL up
 
             except Exception as e:
-                print(f"Thread {thread_id}: Error processing {url}: {e}")
+                logger.error(f"Thread {thread_id}: Error processing {url}: {e}")
+                csv_writer.submit(error_record(url, e))
+                backoff_after_error()
                 continue
 
-    except KeyboardInterrupt:
-        print(f"Thread {thread_id}: Interrupted")
-        if batch:
-            save_to_csv(batch, filename)
-
     finally:
-        if batch:
-            save_to_csv(batch, filename)
-        driver.quit()
-        print(f"Thread {thread_id}: Completed - processed {processed} properties")
+        if driver is not None:
+            driver_pool.release(driver)
+        logger.info(f"Thread {thread_id}: Completed - processed {processed} properties")
 
 
-def scrape_booking_properties(destinations, num_threads=3, batch_size=5):
-    """Main scraping function"""
-    print("=== BOOKING.COM SCRAPER ===")
+def run_browser_workers(property_urls, num_threads, driver_pool, csv_writer):
+    """Scrape property_urls with up to num_threads browser workers and wait for them to finish"""
+    # Share one queue of URLs so a thread stuck on a slow property does not hold back a whole chunk
+    num_workers = max(1, min(num_threads, len(property_urls)))
+    url_queue = queue.Queue()
+    for url in property_urls:
+        url_queue.put(url)
+    for _ in range(num_workers):
+        url_queue.put(None)  # one stop sentinel per worker
 
-    # Generate URLs
-    print(f"Generating URLs for: {destinations}")
-    search_urls = build_urls(destinations)
+    logger.info(f"Queued {len(property_urls)} properties for {num_workers} threads")
 
-    # Get property URLs
-    print("Scraping property URLs...")
+    # Start threads
+    logger.info(f"Starting {num_workers} threads...")
+    executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='scraper')
+    # Workers log their own failures; shutdown() waits for all of them
+    for thread_id in range(1, num_workers + 1):
+        executor.submit(worker_thread, url_queue, driver_pool, thread_id, csv_writer)
+    try:
+        executor.shutdown(wait=True)
+    except KeyboardInterrupt:
+        # Only this thread sees Ctrl-C: stop handing out URLs and let each worker finish its current property
+        dropped = cancel_pending_urls(url_queue, num_workers)
+        logger.warning(f"Interrupted - skipping {dropped} queued properties, waiting for the ones in progress")
+        executor.shutdown(wait=True)
 
-    # Apply testing limit if set
-    max_properties = TEST_MAX_PROPERTIES if TEST_MAX_PROPERTIES else 500
-    property_urls = scrape_property_urls(search_urls, max_links=max_properties)
 
-    print(f"Found {len(property_urls)} properties")
+def scrape_booking_properties(destinations, num_threads=None, batch_size='auto', property_urls=None):
+    """Main scraping function"""
+    logger.info("=== BOOKING.COM SCRAPER ===")
 
-    if not property_urls:
-        print("No properties found")
-        print("\nPossible reasons:")
-        print("1. Booking.com has changed their HTML structure")
-        print("2. Anti-bot detection is blocking the scraper")
-        print("3. The search returned no results")
-        print("\nTry:")
-        print("- Running with a VPN or proxy")
-        print("- Adding more delays between requests")
-        print("- Checking if the cities have properties on Booking.com")
-        return
+    # One pool for the whole run: a browser started for the search becomes the first worker's driver
+    if num_threads is None:
+        num_threads = default_worker_count()
+    driver_pool = DriverPool(num_threads)
 
-    # Divide URLs among threads
-    chunk_size = len(property_urls) // num_threads if num_threads > 0 else len(property_urls)
-    url_chunks = []
+    # Get property URLs (cached for a day per destination set) unless a retry list was given
+    if property_urls is None:
+        # Apply testing limit if set
+        max_properties = TEST_MAX_PROPERTIES if TEST_MAX_PROPERTIES else 500
+        property_urls = get_property_urls(destinations, max_links=max_properties, driver_pool=driver_pool)
+    property_urls = dedupe_urls(property_urls)
 
-    for i in range(num_threads):
-        start = i * chunk_size
-        end = len(property_urls) if i == num_threads - 1 else start + chunk_size
-        if start < len(property_urls):
-            url_chunks.append(property_urls[start:end])
+    logger.info(f"Found {len(property_urls)} properties")
 
-    print(f"Divided into {len(url_chunks)} chunks: {[len(chunk) for chunk in url_chunks]}")
+    if not property_urls:
+        logger.info("No properties found")
+        logger.info("Possible reasons:")
+        logger.info("1. Booking.com has changed their HTML structure")
+        logger.info("2. Anti-bot detection is blocking the scraper")
+        logger.info("3. The search returned no results")
+        logger.info("Try:")
+        logger.info("- Running with a VPN or proxy")
+        logger.info("- Adding more delays between requests")
+        logger.info("- Checking if the cities have properties on Booking.com")
+        driver_pool.close()
+        return
 
     # Setup output file with timestamp
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'/app/results/booking_properties_{"-".join(destinations).lower()}_{timestamp}.csv'
+    filename = f'/app/results/booking_properties_{"-".join(destinations).lower()}_{timestamp}{OUTPUT_EXTENSION}'
+    csv_writer = ThreadSafeCSVWriter(filename, batch_size)
 
-    # Start threads
-    print(f"Starting {len(url_chunks)} threads...")
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        futures = []
-        for i, chunk in enumerate(url_chunks):
-            future = executor.submit(worker_thread, chunk, i + 1, filename, batch_size)
-            futures.append(future)
-
-        # Wait for completion
-        for i, future in enumerate(as_completed(futures)):
-            try:
-                future.result()
-                print(f"Thread {i + 1} completed successfully")
-            except Exception as e:
-                print(f"Thread {i + 1} failed: {e}")
+    try:
+        # Server-rendered pages are handled without Chrome; only the rest go to the browser workers
+        property_urls = scrape_properties_http(property_urls, csv_writer)
+        if property_urls:
+            run_browser_workers(property_urls, num_threads, driver_pool, csv_writer)
+    finally:
+        # Workers have stopped (or a second Ctrl-C gave up on them): quit the sessions and write out every queued row
+        driver_pool.close()
+        wait_for_locations()
+        csv_writer.close()
 
-    print(f"\n=== SCRAPING COMPLETED ===")
-    print(f"Results saved to: {filename}")
+    logger.info("=== SCRAPING COMPLETED ===")
+    logger.info(f"Results saved to: {filename}")
 
 
-def scrape_single_threaded(destinations, batch_size=10):
+def scrape_single_threaded(destinations, batch_size='auto', property_urls=None):
     """Single-threaded version for comparison"""
-    print("=== SINGLE-THREADED SCRAPER ===")
-
-    search_urls = build_urls(destinations)
+    logger.info("=== SINGLE-THREADED SCRAPER ===")
 
-    # Apply testing limit if set
-    max_properties = TEST_MAX_PROPERTIES if TEST_MAX_PROPERTIES else 500
-    property_urls = scrape_property_urls(search_urls, max_links=max_properties)
+    # A one-driver pool, so the browser used for the search (if any) also scrapes the properties
+    driver_pool = DriverPool(1)
+    if property_urls is None:
+        # Apply testing limit if set
+        max_properties = TEST_MAX_PROPERTIES if TEST_MAX_PROPERTIES else 500
+        property_urls = get_property_urls(destinations, max_links=max_properties, driver_pool=driver_pool)
+    property_urls = dedupe_urls(property_urls)
 
     if not property_urls:
-        print("No properties found")
+        logger.info("No properties found")
+        driver_pool.close()
         return
 
-    print(f"Found {len(property_urls)} properties")
+    logger.info(f"Found {len(property_urls)} properties")
 
-    driver = init_driver()
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'/app/results/booking_properties_single_{"-".join(destinations).lower()}_{timestamp}.csv'
+    filename = f'/app/results/booking_properties_single_{"-".join(destinations).lower()}_{timestamp}{OUTPUT_EXTENSION}'
+    csv_writer = ThreadSafeCSVWriter(filename, batch_size)
 
-    batch = []
+    total = len(property_urls)
     processed = 0
 
     try:
+        property_urls = scrape_properties_http(property_urls, csv_writer)
+        processed = total - len(property_urls)
+        driver = driver_pool.acquire() if property_urls else None
+
         for i, url in enumerate(property_urls, 1):
-            print(f"Processing {i}/{len(property_urls)}")
+            if i % PROGRESS_LOG_EVERY == 1 or i == len(property_urls):
+                logger.info(f"Processing {i}/{len(property_urls)}")
 
             try:
                 data = scrape_property_data(driver, url)
-                batch.append(data)
+                submit_with_location(csv_writer, data)
                 processed += 1
 
-                if len(batch) >= batch_size or i == len(property_urls):
-                    save_to_csv(batch, filename)
-                    print(
-                        f"Saved batch. Progress: {processed}/{len(property_urls)} ({processed / len(property_urls) * 100:.1f}%)")
-                    batch = []
+                maintain_driver(driver, processed)
 
-                time.sleep(1)
+            except MemoryError as e:
+                logger.warning("Memory pressure, flushing and shrinking batch size")
+                csv_writer.relieve_memory()
+                csv_writer.submit(error_record(url, e))  # so --retry-failed can pick the URL up
 
             except Exception as e:
-                print(f"Error processing {url}: {e}")
+                logger.error(f"Error processing {url}: {e}")
+                csv_writer.submit(error_record(url, e))
+                backoff_after_error()
                 continue
 
     except KeyboardInterrupt:
-        print("Interrupted by user")
-        if batch:
-            save_to_csv(batch, filename)
+        logger.warning("Interrupted by user")
 
     finally:
-        if batch:
-            save_to_csv(batch, filename)
-        driver.quit()
-        print(f"\nCompleted: {processed}/{len(property_urls)} properties")
-        print(f"Results saved to: {filename}")
+        driver_pool.close()
+        wait_for_locations()
+        csv_writer.close()
+        logger.info(f"Completed: {processed}/{total} properties")
+        logger.info(f"Results saved to: {filename}")
+
+
+def threads_arg(value):
+    """argparse type for --threads: a positive integer"""
+    threads = int(value)
+    if threads < 1:
+        raise argparse.ArgumentTypeError("threads must be >= 1")
+    return threads
+
+
+def batch_size_arg(value):
+    """argparse type for --batch-size: a positive integer or 'auto'"""
+    if value == 'auto':
+        return value
+    size = int(value)
+    if size < 1:
+        raise argparse.ArgumentTypeError("batch size must be >= 1 or 'auto'")
+    return size
 
 
 if __name__ == "__main__":
-    cities = ["Tangier"]
-    scrape_single_threaded(cities, batch_size=5)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Booking.com WiFi scores")
+    parser.add_argument('--destinations', nargs='+', default=["Tangier"])
+    parser.add_argument('--mode', choices=['threaded', 'single'], default='threaded')
+    parser.add_argument('--threads', type=threads_arg, default=None, help="default: SCRAPER_WORKERS or sized by memory")
+    parser.add_argument('--batch-size', type=batch_size_arg, default='auto')
+    parser.add_argument('--retry-failed', metavar='CSV', help="re-scrape only the rows of CSV that have a scrape_error")
+    args = parser.parse_args()
+
+    setup_logging(os.environ.get('SCRAPER_LOG_LEVEL', 'INFO').upper())
+    property_urls = failed_urls(args.retry_failed) if args.retry_failed else None
+    if args.mode == 'threaded':
+        scrape_booking_properties(args.destinations, num_threads=args.threads, batch_size=args.batch_size,
+                                  property_urls=property_urls)
+    else:
+        scrape_single_threaded(args.destinations, batch_size=args.batch_size, property_urls=property_urls)
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import lxml.html
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import booking_wifi_score_scraper
+import reviews_per_category_booking_scraper
+
+PAGE = """<html><body>
+<div class="bui-card"><span class="prco-valign-middle-helper">MAD 700</span></div>
+<table class="hprt-table"><tr>
+  <td class="hp-price-left-align hprt-table-cell hprt-table-cell-price">
+    <div class="hprt-price-block"><div class="prco-wrapper">
+      <span class="prco-valign-middle-helper">MAD 1,050</span>
+    </div></div>
+  </td>
+  <td class="hp-price-left-align hprt-table-cell hprt-table-cell-price">
+    <div class="hprt-price-block"><div class="prco-wrapper">
+      <span class="prco-valign-middle-helper">MAD 1,420</span>
+    </div></div>
+  </td>
+</tr></table>
+</body></html>"""
+
+
+@pytest.mark.parametrize("scraper", [booking_wifi_score_scraper, reviews_per_category_booking_scraper])
+def test_helper_span_outside_the_room_table_is_ignored(scraper):
+    assert scraper.extract_prices(lxml.html.fromstring(PAGE), PAGE) == (1050, 1420)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import booking_wifi_score_scraper
+import reviews_per_category_booking_scraper
+
+
+class FailingDriver:
+    """Driver whose page load always times out"""
+
+    def get(self, url):
+        raise TimeoutException("page load timed out")
+
+
+@pytest.mark.parametrize("scraper", [booking_wifi_score_scraper, reviews_per_category_booking_scraper])
+def test_failed_page_load_is_selected_by_retry_failed(scraper, tmp_path):
+    url = "https://www.booking.com/hotel/ma/example.html"
+    data = scraper.scrape_property_data(FailingDriver(), url)
+    assert data['scrape_error'].startswith("TimeoutException")
+
+    filename = str(tmp_path / "results.csv")
+    csv_writer = scraper.ThreadSafeCSVWriter(filename, batch_size=5)
+    csv_writer.submit(data)
+    csv_writer.submit(scraper.new_property_record("https://www.booking.com/hotel/ma/fine.html"))
+    csv_writer.close()
+
+    assert scraper.failed_urls(filename) == [url]
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import lxml.html
+import pytest
+from selenium.common.exceptions import InvalidSessionIdException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reviews_per_category_booking_scraper as scraper
+
+# (score, stay date, traveler type) as both the review-list endpoint and the review panel show them
+REVIEWS = [
+    (9.0, "May 2025", "Business traveller"),
+    (7.0, "June 2025", "Business traveller"),
+    (8.0, "May 2025", "Couple"),
+    (10.0, "July 2025", "Solo traveller"),
+    (4.0, "May 2024", "Business traveller"),  # other year, filtered out
+]
+
+
+def reviewlist_page(reviews):
+    items = "".join(
+        f'<li class="review_list_new_item_block">'
+        f'<div class="bui-review-score__badge">{score}</div>'
+        f'<ul class="c-review-block__stay-date"><li><span class="c-review-block__date">{stay}</span></li></ul>'
+        f'<ul class="review-panel-wide__traveller_type"><li><div class="bui-list__body">{traveler}</div></li></ul>'
+        f'</li>'
+        for score, stay, traveler in reviews
+    )
+    return lxml.html.fromstring(f"<html><body><ul>{items}</ul></body></html>")
+
+
+class ReviewPanelDriver:
+    """Review panel with a single page of cards"""
+
+    def execute_script(self, script, *args):
+        assert script == scraper.JS_REVIEW_CARDS
+        return [[f"Scored {score}", stay, traveler] for score, stay, traveler in REVIEWS]
+
+
+def scores_fields(traveler_scores):
+    data = scraper.new_property_record("https://www.booking.com/hotel/ma/example.html")
+    scraper.apply_traveler_scores(data, traveler_scores)
+    return {k: v for k, v in data.items() if k.startswith('avg_review_score_') and v is not None}
+
+
+def test_review_list_and_review_panel_agree(monkeypatch):
+    monkeypatch.setattr(scraper, "select_review_option", lambda *args, **kwargs: None)
+    monkeypatch.setattr(scraper, "next_review_page", lambda *args, **kwargs: False)
+
+    http_fields = scores_fields(scraper.reviewlist_scores([reviewlist_page(REVIEWS)], target_year=2025))
+    panel_fields = scores_fields(scraper.process_reviews_by_traveler_type(ReviewPanelDriver(), target_year=2025))
+
+    assert http_fields == panel_fields
+    assert panel_fields['avg_review_score_business_travellers'] == 8.0
+    assert panel_fields['avg_review_score_business_travellers_count'] == 2
+    assert panel_fields['avg_review_score_all_count'] == 4
+
+
+def test_labels_normalizing_to_one_field_are_merged():
+    fields = scores_fields({"Business traveller": (9.0, 1), "Business travellers": (7.0, 3)})
+
+    assert fields['avg_review_score_business_travellers'] == 7.5
+    assert fields['avg_review_score_business_travellers_count'] == 4
+    assert fields['avg_review_score_all_count'] == 4
+
+
+def test_review_panel_session_loss_reaches_the_worker(monkeypatch):
+    monkeypatch.setattr(scraper, "select_review_option", lambda *args, **kwargs: None)
+
+    class LostSessionDriver:
+        def execute_script(self, script, *args):
+            raise InvalidSessionIdException("session deleted")
+
+    with pytest.raises(InvalidSessionIdException):
+        scraper.process_reviews_by_traveler_type(LostSessionDriver())